@@ -1,110 +1,231 @@
 #!/usr/bin/env python3
-import json
-import csv
+import polars as pl
+import multiprocessing
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import argparse
 
+BILLIONAIRE_FIELDS = [
+    "personName",
+    "lastName",
+    "birthDate",
+    "gender",
+    "countryOfCitizenship",
+    "city",
+    "state",
+    "finalWorth",
+    "estWorthPrev",
+    "archivedWorth",
+    "privateAssetsWorth",
+    "source",
+    "industries",
+]
 
-def convert_json_to_csv(json_folder, output_prefix="raw_data"):
+ASSET_FIELDS = [
+    "companyName",
+    "currencyCode",
+    "currentPrice",
+    "exchange",
+    "exchangeRate",
+    "exerciseOptionPrice",
+    "interactive",
+    "numberOfShares",
+    "sharePrice",
+    "ticker",
+]
+
+# Every field is read as text, so integers never go through Float64 inference;
+# fractional numbers are still parsed as f64 by read_json before being rendered
+RECORD_SCHEMA = pl.Struct(
+    {
+        **{field: pl.Utf8 for field in BILLIONAIRE_FIELDS},
+        "industries": pl.List(pl.Utf8),
+        "financialAssets": pl.List(
+            pl.Struct({field: pl.Utf8 for field in ASSET_FIELDS})
+        ),
+    }
+)
+
+# Where the records live, depending on the API version
+RECORD_LAYOUTS = [
+    ("personList", pl.Struct({"personsLists": pl.List(RECORD_SCHEMA)})),
+    ("personList", pl.List(RECORD_SCHEMA)),
+    ("data", pl.List(RECORD_SCHEMA)),
+]
+
+# Layout that matched the previous file; snapshots of one era share it
+last_layout = RECORD_LAYOUTS[0]
+
+
+def as_text(expr, dtype):
+    """Render a JSON value as text for the Decimal cast
+
+    Integers and strings keep their exact digits; fractional numbers keep the
+    f64 precision read_json parsed them with.
+    """
+    if isinstance(dtype, pl.List):
+        # Keep the Python list repr used by earlier exports, e.g. "['Technology']"
+        return pl.format(
+            "[{}]", expr.list.eval(pl.format("'{}'", pl.element())).list.join(", ")
+        )
+    return expr.cast(pl.Utf8)
+
+
+def select_fields(df, fields, struct_col=None):
+    """Project the given fields as strings"""
+    if struct_col is None:
+        schema = df.schema
+        get_field = pl.col
+    else:
+        schema = {f.name: f.dtype for f in df.schema[struct_col].fields}
+        get_field = pl.col(struct_col).struct.field
+
+    return [as_text(get_field(field), schema[field]).alias(field) for field in fields]
+
+
+def read_records(json_file):
+    """Read a snapshot's records, trying the last matching layout first"""
+    global last_layout
+    error = None
+    layouts = [last_layout] + [
+        other for other in RECORD_LAYOUTS if other is not last_layout
+    ]
+    for layout in layouts:
+        key, dtype = layout
+        try:
+            df = pl.read_json(json_file, schema={key: dtype})
+        except Exception as e:
+            # Keep the first error, it comes from the most likely layout
+            error = error or e
+            continue
+        if df.get_column(key).is_null().all():
+            continue
+
+        last_layout = layout
+        records = pl.col(key)
+        if isinstance(dtype, pl.Struct):
+            records = records.struct.field("personsLists")
+        return df.select(records.alias("records")), None
+
+    return None, error
+
+
+def parse_one(json_file):
+    """Parse one snapshot into (billionaires, assets) DataFrames of strings"""
+    records_df, error = read_records(json_file)
+    if records_df is None:
+        # Deserializing errors quote the offending value, which can be huge
+        reason = str(error).splitlines()[0][:120] if error else "no records found"
+        print(f"Skipping {json_file}: {reason}")
+        return None
+
+    records_df = (
+        records_df.explode("records")
+        .filter(pl.col("records").is_not_null())
+        .unnest("records")
+    )
+
+    date = pl.lit(Path(json_file).stem[:8]).alias("date")
+    billionaires = records_df.select(
+        date, *select_fields(records_df, BILLIONAIRE_FIELDS)
+    )
+
+    assets_df = (
+        records_df.select(
+            date, *select_fields(records_df, ["personName"]), "financialAssets"
+        )
+        .explode("financialAssets")
+        .filter(pl.col("financialAssets").is_not_null())
+    )
+    assets = assets_df.select(
+        "date",
+        "personName",
+        *select_fields(assets_df, ASSET_FIELDS, struct_col="financialAssets"),
+    )
+
+    return billionaires, assets
+
+
+def merge_parts(parts, output_file):
+    """Stream per-file parts into a single Parquet file and return its row count"""
+    if not parts:
+        return 0
+    pl.scan_parquet(parts).sink_parquet(
+        output_file, compression="zstd", row_group_size=512_000
+    )
+    return pl.scan_parquet(output_file).select(pl.len()).collect().item()
+
+
+def convert_json_to_csv(json_folder, output_prefix="raw_data", workers=None):
     json_files = sorted(Path(json_folder).glob("*.json"))
     if not json_files:
         print(f"No JSON files found in {json_folder}")
         return False
 
-    billionaires = []
-    assets = []
+    billionaire_parts = []
+    asset_parts = []
     total_files = len(json_files)
 
     print(f"Processing {total_files} JSON files...")
 
-    for i, json_file in enumerate(json_files, 1):
-        if i % 10 == 0 or i == total_files:
-            print(f"Processed {i}/{total_files} files...")
+    # Polars runs its own thread pool, so workers must not be forked from it
+    context = multiprocessing.get_context("spawn")
 
-        try:
-            with open(json_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            date_str = json_file.stem[:8]
-            records = (
-                data.get("personList", {}).get("personsLists")
-                or data.get("personList")
-                or data.get("data", [])
-            )
+    # Each parsed file is spilled to disk right away so memory stays O(one file)
+    with tempfile.TemporaryDirectory(
+        prefix=".parts_", dir=Path(output_prefix).parent
+    ) as parts_dir:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            # Hand out files in batches so IPC overhead doesn't dominate small files
+            parsed_files = executor.map(parse_one, json_files, chunksize=16)
+            for i, parsed in enumerate(parsed_files, 1):
+                if i % 10 == 0 or i == total_files:
+                    print(f"Processed {i}/{total_files} files...")
 
-            for record in records:
-                billionaire = {
-                    "date": date_str,
-                    "personName": record.get("personName", ""),
-                    "lastName": record.get("lastName", ""),
-                    "birthDate": record.get("birthDate", ""),
-                    "gender": record.get("gender", ""),
-                    "countryOfCitizenship": record.get("countryOfCitizenship", ""),
-                    "city": record.get("city", ""),
-                    "state": record.get("state", ""),
-                    "finalWorth": record.get("finalWorth", ""),
-                    "estWorthPrev": record.get("estWorthPrev", ""),
-                    "archivedWorth": record.get("archivedWorth", ""),
-                    "privateAssetsWorth": record.get("privateAssetsWorth", ""),
-                    "source": record.get("source", ""),
-                    "industries": record.get("industries", ""),
-                }
-                billionaires.append(billionaire)
-
-                # Process assets with all discovered columns
-                for asset in record.get("financialAssets", []):
-                    assets.append(
-                        {
-                            "date": date_str,
-                            "personName": record.get("personName", ""),
-                            "companyName": asset.get("companyName", ""),
-                            "currencyCode": asset.get("currencyCode", ""),
-                            "currentPrice": asset.get("currentPrice", ""),
-                            "exchange": asset.get("exchange", ""),
-                            "exchangeRate": asset.get("exchangeRate", ""),
-                            "exerciseOptionPrice": asset.get("exerciseOptionPrice", ""),
-                            "interactive": asset.get("interactive", ""),
-                            "numberOfShares": asset.get("numberOfShares", ""),
-                            "sharePrice": asset.get("sharePrice", ""),
-                            "ticker": asset.get("ticker", ""),
-                        }
-                    )
-        except Exception:
-            continue
+                if parsed is None:
+                    continue
+                bill_df, assets_df = parsed
+                if bill_df.height:
+                    part = Path(parts_dir) / f"billionaires_{i:06d}.parquet"
+                    bill_df.write_parquet(part)
+                    billionaire_parts.append(part)
+                if assets_df.height:
+                    part = Path(parts_dir) / f"assets_{i:06d}.parquet"
+                    assets_df.write_parquet(part)
+                    asset_parts.append(part)
 
-    # Write billionaires CSV
-    if billionaires:
-        with open(
-            f"{output_prefix}_billionaires.csv", "w", newline="", encoding="utf-8"
-        ) as f:
-            writer = csv.DictWriter(f, fieldnames=billionaires[0].keys())
-            writer.writeheader()
-            writer.writerows(billionaires)
-        print(
-            f"Created {output_prefix}_billionaires.csv with {len(billionaires)} records"
+        # Write billionaires Parquet
+        bill_rows = merge_parts(
+            billionaire_parts, f"{output_prefix}_billionaires.parquet"
         )
+        if bill_rows:
+            print(
+                f"Created {output_prefix}_billionaires.parquet with {bill_rows} records"
+            )
 
-    # Write assets CSV
-    if assets:
-        with open(
-            f"{output_prefix}_assets.csv", "w", newline="", encoding="utf-8"
-        ) as f:
-            writer = csv.DictWriter(f, fieldnames=assets[0].keys())
-            writer.writeheader()
-            writer.writerows(assets)
-        print(f"Created {output_prefix}_assets.csv with {len(assets)} records")
+        # Write assets Parquet
+        asset_rows = merge_parts(asset_parts, f"{output_prefix}_assets.parquet")
+        if asset_rows:
+            print(f"Created {output_prefix}_assets.parquet with {asset_rows} records")
 
-    return bool(billionaires or assets)
+    return bool(bill_rows or asset_rows)
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Simple JSON to CSV converter")
+    parser = argparse.ArgumentParser(description="Simple JSON to Parquet converter")
     parser.add_argument("json_folder", help="Folder containing JSON files")
     parser.add_argument(
         "--output-prefix", "-o", default="raw_data", help="Output file prefix"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Parser processes (default: one per CPU)",
+    )
     args = parser.parse_args()
 
-    success = convert_json_to_csv(args.json_folder, args.output_prefix)
+    success = convert_json_to_csv(args.json_folder, args.output_prefix, args.workers)
     sys.exit(0 if success else 1)
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 import polars as pl
 import argparse
+import functools
 from pathlib import Path
 import sys
 
+from drop_double import clean_and_deduplicate
+
 
 def get_billionaires_schema():
     return {
@@ -11,7 +14,7 @@ def get_billionaires_schema():
         "personName": pl.Categorical,
         "lastName": pl.Categorical,
         "birthDate": pl.Date,  # Will handle epoch conversion
-        "gender": pl.Categorical,
+        "gender": pl.Enum(["M", "F"]),  # Closed set, stable dictionary indices
         "countryOfCitizenship": pl.Categorical,
         "city": pl.Categorical,
         "state": pl.Categorical,
@@ -41,153 +44,205 @@ def get_assets_schema():
     }
 
 
-def get_csv_read_schema(target_schema):
-    """Create a schema for reading CSV where all columns are strings to prevent float conversion"""
-    csv_schema = {}
-    for col_name, _ in target_schema.items():
-        csv_schema[col_name] = pl.Utf8
-    return csv_schema
+def date_expr(col_name, dtype):
+    # Snapshot dates are YYYYMMDD, every other date is ISO formatted
+    date_format = "%Y%m%d" if col_name == "date" else "%Y-%m-%d"
+    return pl.col(col_name).str.strptime(pl.Date, date_format, strict=False)
 
 
-def convert_to_parquet(
-    csv_file, schema_func, output_file, compression="snappy", sort_columns=None
-):
-    print(f"📖 Reading {csv_file}...")
+def birth_date_expr(col_name, dtype):
+    # Epoch timestamps (ms) parse as integers, anything else is tried as ISO date
+    epoch = (
+        pl.col(col_name)
+        .cast(pl.Int64, strict=False)
+        .cast(pl.Datetime(time_unit="ms"))
+        .cast(pl.Date)
+    )
+    iso = pl.col(col_name).str.strptime(pl.Date, "%Y-%m-%d", strict=False)
+    return pl.coalesce(epoch, iso)
 
-    # Get target schema
-    target_schema = schema_func()
 
-    # Read CSV with all columns as strings to prevent any automatic float conversion
-    csv_read_schema = get_csv_read_schema(target_schema)
-    df = pl.read_csv(
-        csv_file,
-        schema_overrides=csv_read_schema,
-        infer_schema_length=0,  # Disable inference completely
+def decimal_expr(col_name, dtype):
+    # DIRECT conversion from string to Decimal, no float intermediate
+    text = pl.when(pl.col(col_name) == "").then(None).otherwise(pl.col(col_name))
+    decoded = text.str.to_decimal(scale=dtype.scale)
+    # to_decimal turns unparseable text into null; strict-casting just those
+    # values raises InvalidOperationError naming them instead of losing them
+    rejected = pl.when(text.is_not_null() & decoded.is_null()).then(text)
+    return pl.coalesce(decoded, rejected.cast(dtype)).cast(dtype)
+
+
+def boolean_expr(col_name, dtype):
+    return (
+        pl.col(col_name)
+        .str.to_lowercase()
+        .replace_strict(
+            {"true": True, "1": True, "false": False, "0": False},
+            default=None,
+            return_dtype=pl.Boolean,
+        )
     )
-    print(f"   Original shape: {df.shape}")
-    print(f"   All columns read as strings to preserve precision")
 
+
+def categorical_expr(col_name, dtype):
+    return (
+        pl.when(pl.col(col_name) == "")
+        .then(None)
+        .otherwise(pl.col(col_name))
+        .cast(pl.Categorical)
+    )
+
+
+def enum_expr(col_name, dtype):
+    # Values outside the declared categories (including "") become null
+    return pl.col(col_name).cast(dtype, strict=False)
+
+
+# String → target type conversions, keyed by the target's base dtype
+CAST_EXPRESSIONS = {
+    pl.Date: date_expr,
+    pl.Decimal: decimal_expr,
+    pl.Boolean: boolean_expr,
+    pl.Categorical: categorical_expr,
+    pl.Enum: enum_expr,
+}
+
+# Columns that need special handling regardless of their dtype
+COLUMN_EXPRESSIONS = {
+    "birthDate": birth_date_expr,  # May hold epoch timestamps
+}
+
+
+@functools.lru_cache(maxsize=None)
+def build_column_expressions(schema_func, input_columns):
+    """Build the cast expressions for a schema once per (schema, input columns)"""
     column_expressions = []
 
-    for col_name, dtype in target_schema.items():
-        if col_name not in df.columns:
+    for col_name, dtype in schema_func().items():
+        if col_name not in input_columns:
             # Handle missing columns
             if dtype == pl.Categorical:
                 expr = pl.lit(None).cast(pl.Utf8).cast(pl.Categorical)
             else:
                 expr = pl.lit(None).cast(dtype)
-            column_expressions.append(expr.alias(col_name))
-            continue
-
-        # Special handling for epoch birthDate
-        if col_name == "birthDate":
-            # First check if the value is numeric (epoch timestamp)
-            expr = (
-                pl.when(pl.col(col_name).str.contains("^[0-9]+$"))
-                .then(
-                    pl.col(col_name)
-                    .cast(pl.Int64)
-                    .cast(pl.Datetime(time_unit="ms"))
-                    .cast(pl.Date)
-                )
-                .otherwise(
-                    pl.col(col_name).str.strptime(pl.Date, "%Y-%m-%d", strict=False)
-                )
-                .alias(col_name)
+        else:
+            build_expr = COLUMN_EXPRESSIONS.get(col_name) or CAST_EXPRESSIONS.get(
+                dtype.base_type()
             )
-        # Date handling
-        elif dtype == pl.Date:
-            if col_name == "date":
-                # Date is in YYYYMMDD format
-                expr = pl.col(col_name).str.strptime(pl.Date, "%Y%m%d", strict=False)
+            if build_expr:
+                expr = build_expr(col_name, dtype)
             else:
-                expr = pl.col(col_name).str.strptime(pl.Date, "%Y-%m-%d", strict=False)
-        # Decimal handling - DIRECT conversion from string to Decimal
-        elif "Decimal" in str(dtype):
-            expr = (
-                pl.when(pl.col(col_name) == "")
-                .then(None)
-                .otherwise(pl.col(col_name))
-                .cast(
-                    dtype
-                )  # Direct cast from string to Decimal, no float intermediate
-                .alias(col_name)
-            )
-        # Boolean handling
-        elif dtype == pl.Boolean:
-            expr = (
-                pl.when(pl.col(col_name).is_in(["True", "true", "1", "TRUE"]))
-                .then(True)
-                .when(pl.col(col_name).is_in(["False", "false", "0", "FALSE"]))
-                .then(False)
-                .otherwise(None)
-                .alias(col_name)
-            )
-        # Categorical handling
-        elif dtype == pl.Categorical:
-            expr = (
-                pl.when(pl.col(col_name) == "")
-                .then(None)
-                .otherwise(pl.col(col_name))
-                .cast(pl.Categorical)
-                .alias(col_name)
-            )
-        # Default casting
-        else:
-            expr = pl.col(col_name).cast(dtype).alias(col_name)
+                # Default casting
+                expr = pl.col(col_name).cast(dtype)
+
+        column_expressions.append(expr.alias(col_name))
+
+    return tuple(column_expressions)
+
+
+def convert_to_parquet(
+    input_file,
+    schema_func,
+    output_file,
+    compression="zstd",
+    sort_columns=None,
+    dataset_type=None,
+    compression_level=3,
+):
+    print(f"📖 Scanning {input_file}...")
+
+    # Get target schema
+    target_schema = schema_func()
 
-        column_expressions.append(expr)
+    # Raw Parquet from convert_csv.py stores every value as a string, so no
+    # float conversion can happen before the Decimal casts below
+    lf = pl.scan_parquet(input_file)
+    input_columns = lf.collect_schema().names()
+    # Only decode the columns the target schema uses
+    lf = lf.select([col for col in input_columns if col in target_schema])
+    print(f"   Original rows: {lf.select(pl.len()).collect().item():,}")
+    print(f"   All columns stored as strings to preserve precision")
+
+    # Deduplicate on the raw strings before any casting
+    if dataset_type:
+        print(f"🧹 Cleaning and deduplicating {dataset_type}...")
+        lf = clean_and_deduplicate(lf, dataset_type)
+
+    column_expressions = build_column_expressions(schema_func, tuple(input_columns))
 
     print("🔄 Applying schema transformations (string → target types)...")
-    df_typed = df.select(column_expressions)
-    df_final = df_typed.select(list(target_schema.keys()))
+    lf_final = lf.select(column_expressions).select(list(target_schema.keys()))
 
     # Sort data for better compression
     if sort_columns:
         print(f"🔀 Sorting data by {', '.join(sort_columns)}...")
-        df_final = df_final.sort(sort_columns)
+        lf_final = lf_final.sort(sort_columns)
 
-    print(f"   Final shape: {df_final.shape}")
     print(f"💾 Writing {output_file} with {compression} compression...")
-    df_final.write_parquet(output_file, compression=compression)
+    # The default streaming chunk size makes sink_parquet emit many tiny chunks;
+    # scoped so callers' Polars config is left as it was
+    with pl.Config(streaming_chunk_size=100_000):
+        lf_final.sink_parquet(
+            output_file,
+            compression=compression,
+            compression_level=compression_level,  # Ignored by snappy/lz4
+            row_group_size=512_000,
+            engine="streaming",
+        )
+
+    df_final = pl.scan_parquet(output_file)
+    row_count = df_final.select(pl.len()).collect().item()
+    print(f"   Final shape: ({row_count}, {len(target_schema)})")
 
     # Verify decimal precision was preserved
     print("🔍 Verifying decimal precision...")
-    sample_decimals = []
-    for col, dtype in target_schema.items():
-        if "Decimal" in str(dtype):
-            non_null = df_final.filter(pl.col(col).is_not_null()).select(col).limit(5)
-            if len(non_null) > 0:
-                sample_decimals.append(f"   {col}: {non_null[col].to_list()[0]}")
+    decimal_cols = [
+        col for col, dtype in target_schema.items() if isinstance(dtype, pl.Decimal)
+    ]
+    # First non-null value of every Decimal column in a single projected query
+    first_values = df_final.select(pl.col(decimal_cols).drop_nulls().first()).collect()
+    sample_decimals = [
+        f"   {col}: {first_values[col][0]}"
+        for col in decimal_cols
+        if first_values[col][0] is not None
+    ]
     if sample_decimals:
         print("   Sample decimal values (first non-null):")
         for sample in sample_decimals[:3]:  # Show first 3 decimal columns
             print(sample)
 
-    return df_final.shape[0]
+    return row_count
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Convert CSV to Parquet")
-    parser.add_argument("--billionaires", required=True, help="Billionaires CSV path")
-    parser.add_argument("--assets", required=True, help="Assets CSV path")
+    parser = argparse.ArgumentParser(
+        description="Clean, deduplicate and convert raw data to Parquet"
+    )
+    parser.add_argument(
+        "--billionaires", required=True, help="Raw billionaires Parquet path"
+    )
+    parser.add_argument("--assets", required=True, help="Raw assets Parquet path")
     parser.add_argument("--output-dir", default="parquet_data", help="Output directory")
     parser.add_argument(
         "--compression",
-        default="snappy",
+        default="zstd",
         choices=["snappy", "gzip", "lz4", "zstd", "brotli", "uncompressed"],
-        help="Compression algorithm (default: snappy)",
+        help="Compression algorithm (default: zstd)",
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        default=3,
+        help="Level for zstd/gzip/brotli, e.g. 9 for archival (default: 3)",
     )
     args = parser.parse_args()
 
     output_dir = Path(args.output_dir)
     output_dir.mkdir(exist_ok=True, parents=True)
 
-    print("🚀 Starting CSV to Parquet conversion...")
-    print(f"📦 Using {args.compression} compression")
-    print(
-        "🔒 Reading all numeric values as strings first to preserve decimal precision"
-    )
+    print("🚀 Starting raw data to Parquet conversion...")
+    print(f"📦 Using {args.compression} compression (level {args.compression_level})")
+    print("🔒 Numeric values stay strings until the Decimal cast to preserve precision")
 
     try:
         # Process billionaires
@@ -199,7 +254,10 @@ def main():
             get_billionaires_schema,
             bill_path,
             args.compression,
-            sort_columns=["personName", "date"],
+            # Low-cardinality columns first give longer RLE/dictionary runs
+            sort_columns=["countryOfCitizenship", "personName", "date"],
+            dataset_type="billionaires",
+            compression_level=args.compression_level,
         )
 
         # Process assets
@@ -211,7 +269,16 @@ def main():
             get_assets_schema,
             assets_path,
             args.compression,
-            sort_columns=["personName", "companyName", "interactive", "date"],
+            sort_columns=[
+                "exchange",
+                "currencyCode",
+                "interactive",
+                "companyName",
+                "personName",
+                "date",
+            ],
+            dataset_type="assets",
+            compression_level=args.compression_level,
         )
 
         # Summary
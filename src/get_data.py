@@ -1,11 +1,179 @@
 #!/usr/bin/env python3
+import aiohttp
+import asyncio
 import requests
 import json
+import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
-import time
 from pathlib import Path
 import argparse
-from collections import defaultdict
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N)"}
+
+# Rate-limit responses worth retrying, with exponential backoff between attempts
+RETRY_STATUSES = {429, 503}
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+# Longest Retry-After honoured; a longer one would idle a connection slot
+MAX_RETRY_AFTER = 60
+
+# One CDX capture and the file name it will be saved under
+Snap = namedtuple("Snap", ["timestamp", "original", "filename"])
+
+
+def write_json(filepath, raw):
+    """Save a snapshot's bytes as served, once they are known to be valid JSON"""
+    json.loads(raw)  # Raises on truncated bodies or HTML error pages
+    filepath.write_bytes(raw)
+
+
+def fetch_cdx(session, url, params):
+    """List (timestamp, original) captures of one URL, or the exception on failure"""
+    try:
+        res = session.get(
+            "https://web.archive.org/cdx/search/cdx",
+            params={"url": url, **params},
+            timeout=30,
+        )
+        res.raise_for_status()
+        data = res.json()
+    except Exception as e:
+        return e
+
+    if len(data) < 2:
+        return []
+    # Only two columns are used, so look them up once instead of building dicts
+    headers = data[0]
+    ts_i, original_i = headers.index("timestamp"), headers.index("original")
+    return [(row[ts_i], row[original_i]) for row in data[1:]]
+
+
+def write_batch(batch):
+    """Write a batch of (filepath, raw) snapshots, returning the failed names"""
+    failures = []
+    for filepath, raw in batch:
+        try:
+            write_json(filepath, raw)
+        except Exception as e:
+            failures.append((filepath.name, e))
+    return failures
+
+
+async def writer(write_queue):
+    """Drain downloaded snapshots to disk until a None arrives, counting failures"""
+    loop = asyncio.get_running_loop()
+    failed = 0
+    done = False
+
+    while not done:
+        # Take everything that piled up while the previous batch was written
+        batch = [await write_queue.get()]
+        while not write_queue.empty():
+            batch.append(write_queue.get_nowait())
+        if batch[-1] is None:
+            batch.pop()
+            done = True
+
+        for name, e in await loop.run_in_executor(None, write_batch, batch):
+            print(f"❌ Failed {name}: {str(e)[:50]}")
+            failed += 1
+
+    return failed
+
+
+class RequestPacer:
+    """Space request starts at least `delay` seconds apart across all connections"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = asyncio.Lock()
+        self.next_start = 0.0
+
+    async def wait(self):
+        async with self.lock:
+            now = asyncio.get_running_loop().time()
+            if self.next_start > now:
+                await asyncio.sleep(self.next_start - now)
+            self.next_start = max(now, self.next_start) + self.delay
+
+
+async def get_with_retry(session, pacer, url):
+    """GET a snapshot's bytes, backing off and retrying when rate limited"""
+    for attempt in range(MAX_RETRIES + 1):
+        await pacer.wait()
+        try:
+            async with session.get(url) as res:
+                if res.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    res.raise_for_status()
+                    return await res.read()
+                # Honour the server's Retry-After when it gives one in seconds
+                retry_after = res.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    backoff = min(int(retry_after), MAX_RETRY_AFTER)
+                else:
+                    backoff = BACKOFF_FACTOR * 2**attempt
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == MAX_RETRIES:
+                raise
+            backoff = BACKOFF_FACTOR * 2**attempt
+        await asyncio.sleep(backoff)
+
+
+async def fetch(session, sem, pacer, url, filepath, write_queue):
+    """Download one snapshot and queue it for writing, returning True on success"""
+    async with sem:
+        try:
+            raw = await get_with_retry(session, pacer, url)
+
+            # Hand off to the writer so this slot can start the next download
+            await write_queue.put((filepath, raw))
+            return True
+        except Exception as e:
+            print(f"❌ Failed {filepath.name}: {str(e)[:50]}")
+            return False
+
+
+async def download_snapshots(downloads, concurrency, delay):
+    """Download (url, filepath) pairs concurrently over one shared session"""
+    sem = asyncio.Semaphore(concurrency)
+    # Keep the overall request rate polite towards the Wayback Machine
+    pacer = RequestPacer(delay)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    # Per socket operation like requests' timeout, so big bodies aren't cut off
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+    # Bounded so finished downloads can't pile up in memory behind a slow disk
+    write_queue = asyncio.Queue(maxsize=64)
+    successful = failed = 0
+    # About 20 progress lines per run, however many files there are
+    progress_every = max(10, len(downloads) // 20)
+
+    async with aiohttp.ClientSession(
+        headers=HEADERS, connector=connector, timeout=timeout
+    ) as session:
+        write_task = asyncio.create_task(writer(write_queue))
+        tasks = [
+            fetch(session, sem, pacer, url, filepath, write_queue)
+            for url, filepath in downloads
+        ]
+        for i, task in enumerate(asyncio.as_completed(tasks), 1):
+            if await task:
+                successful += 1
+            else:
+                failed += 1
+
+            # Progress updates
+            if i % progress_every == 0 or i == len(tasks):
+                print(f"📊 Processed: {i}/{len(tasks)} | ✅ {successful} | ❌ {failed}")
+
+        # Snapshots that downloaded but couldn't be saved count as failures
+        await write_queue.put(None)
+        write_failed = await write_task
+
+    return successful - write_failed, failed + write_failed
 
 
 def main():
@@ -17,7 +185,13 @@ def main():
     parser.add_argument("--output-dir", default="json_files", help="Output directory")
     parser.add_argument("--dry-run", action="store_true", help="Just show snapshots")
     parser.add_argument(
-        "--delay", type=float, default=1.0, help="Delay between downloads"
+        "--delay",
+        type=float,
+        default=1.0,
+        help="Minimum seconds between requests, shared by all connections",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Simultaneous downloads"
     )
     args = parser.parse_args()
 
@@ -35,43 +209,62 @@ def main():
 
     # Setup session
     session = requests.Session()
-    session.headers = {
-        "User-Agent": "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N)"
-    }
+    session.headers = dict(HEADERS)
+    session.headers["Connection"] = "keep-alive"
+    # Only the CDX queries use this session (snapshots go through aiohttp), so
+    # pool one connection per query thread and retry when rate limited
+    session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=len(forbes_urls),
+            max_retries=Retry(
+                total=MAX_RETRIES,
+                backoff_factor=BACKOFF_FACTOR,
+                status_forcelist=sorted(RETRY_STATUSES),
+            ),
+        ),
+    )
 
     # Get available snapshots
     print(f"🔍 Searching snapshots from {args.start_date} to {args.end_date or 'now'}")
     snapshots = []
-    timestamp_counts = defaultdict(int)
-
-    for i, url in enumerate(forbes_urls, 1):
-        print(f"📡 Checking URL {i}/{len(forbes_urls)}")
-        params = {
-            "url": url,
-            "output": "json",
-            "from": args.start_date.replace("-", ""),
-            "to": (args.end_date or datetime.now().strftime("%Y-%m-%d")).replace(
-                "-", ""
-            ),
-            "filter": ["statuscode:200", "mimetype:application/json"],
-            "collapse": "timestamp:8",
-        }
 
-        try:
-            res = session.get(
-                "https://web.archive.org/cdx/search/cdx", params=params, timeout=30
-            )
-            res.raise_for_status()
-            data = res.json()
-            if len(data) > 1:
-                headers = data[0]
-                for row in data[1:]:
-                    snap = dict(zip(headers, row))
-                    snap["source_index"] = i - 1
-                    snapshots.append(snap)
-                print(f"   ✅ Found {len(data)-1} snapshots")
-        except Exception as e:
-            print(f"   ❌ Failed: {e}")
+    params = {
+        "output": "json",
+        "from": args.start_date.replace("-", ""),
+        "to": (args.end_date or datetime.now().strftime("%Y-%m-%d")).replace("-", ""),
+        "filter": ["statuscode:200", "mimetype:application/json"],
+        "collapse": "timestamp:8",
+    }
+
+    # The CDX queries are independent, so run them side by side
+    with ThreadPoolExecutor(max_workers=len(forbes_urls)) as executor:
+        results = executor.map(lambda url: fetch_cdx(session, url, params), forbes_urls)
+
+        seen = set()
+        seen_timestamps = set()
+        for i, rows in enumerate(results, 1):
+            print(f"📡 Checking URL {i}/{len(forbes_urls)}")
+            if isinstance(rows, Exception):
+                print(f"   ❌ Failed: {rows}")
+                continue
+
+            for ts, original in rows:
+                # The same capture can come back for more than one query
+                key = (ts[:8], original)
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                # Handle duplicate timestamps
+                if ts in seen_timestamps:
+                    filename = f"{ts}_source{i - 1}.json"
+                else:
+                    seen_timestamps.add(ts)
+                    filename = f"{ts}.json"
+                snapshots.append(Snap(ts, original, filename))
+            print(f"   ✅ Found {len(rows)} snapshots")
 
     if not snapshots:
         print("❌ No snapshots found")
@@ -82,55 +275,32 @@ def main():
     if args.dry_run:
         print("\n📋 First 10 snapshots:")
         for snap in snapshots[:10]:
-            date_str = datetime.strptime(snap["timestamp"][:8], "%Y%m%d").strftime(
+            date_str = datetime.strptime(snap.timestamp[:8], "%Y%m%d").strftime(
                 "%Y-%m-%d"
             )
-            print(f"  📅 {snap['timestamp']} ({date_str})")
+            print(f"  📅 {snap.timestamp} ({date_str})")
         if len(snapshots) > 10:
             print(f"  ... and {len(snapshots)-10} more")
         return True
 
-    # Download files
-    print(f"📥 Downloading {len(snapshots)} files to {output_dir}/")
-    successful = failed = 0
-
-    for i, snap in enumerate(snapshots, 1):
-        ts = snap["timestamp"]
-        src_idx = snap["source_index"]
-
-        # Handle duplicate timestamps
-        timestamp_counts[ts] += 1
-        filename = (
-            f"{ts}.json" if timestamp_counts[ts] == 1 else f"{ts}_source{src_idx}.json"
-        )
-        filepath = output_dir / filename
-
-        if filepath.exists():
-            print(f"⏭️  Skipping {filename} (exists)")
-            continue
-
-        try:
-            wayback_url = f"https://web.archive.org/web/{ts}id_/{snap['original']}"
-            print(f"📥 Downloading {filename}...", end="", flush=True)
-
-            res = session.get(wayback_url, timeout=30)
-            res.raise_for_status()
-            json_data = res.json()
-
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(json_data, f, ensure_ascii=False)
+    # One directory listing instead of a stat per snapshot on re-runs
+    existing = set(os.listdir(output_dir))
+    downloads = [
+        (f"https://web.archive.org/web/{ts}id_/{original}", output_dir / filename)
+        for ts, original, filename in snapshots
+        if filename not in existing
+    ]
 
-            print(" ✅")
-            successful += 1
-        except Exception as e:
-            print(f" ❌ Failed: {str(e)[:50]}")
-            failed += 1
+    skipped = len(snapshots) - len(downloads)
+    if skipped:
+        print(f"⏭️  Skipping {skipped} files that already exist")
 
-        # Progress updates
-        if i % 10 == 0 or i == len(snapshots):
-            print(f"📊 Processed: {i}/{len(snapshots)} | ✅ {successful} | ❌ {failed}")
+    # Download files
+    print(f"📥 Downloading {len(downloads)} files to {output_dir}/")
 
-        time.sleep(args.delay)
+    successful, failed = asyncio.run(
+        download_snapshots(downloads, args.concurrency, args.delay)
+    )
 
     print(f"\n🎉 Download completed: ✅ {successful} | ❌ {failed}")
     print(f"📁 Files saved to: {output_dir.absolute()}")
@@ -1,19 +1,74 @@
 #!/usr/bin/env python3
-import json
 import argparse
-from pathlib import Path
+import functools
+import os
+from decimal import Decimal, InvalidOperation
 from collections import defaultdict
+from multiprocessing import Pool
+from pathlib import Path
+
+import polars as pl
+
+from snapshot_files import iter_json_files, iter_records, progress_interval
+
+# Define the fields we know are numerical
+BILLIONAIRE_FIELDS = [
+    'finalWorth', 'estWorthPrev', 'archivedWorth', 'privateAssetsWorth'
+]
+
+ASSET_FIELDS = [
+    'numberOfShares', 'sharePrice', 'exchangeRate', 'exerciseOptionPrice', 'currentPrice'
+]
+
+ALL_FIELDS = BILLIONAIRE_FIELDS + ASSET_FIELDS
+
+
+# Hashable scalar types the digit-tuple cache accepts
+NUMERIC_TYPES = (Decimal, int, float, str)
 
 
 def analyze_decimal_precision(value):
-    """Simple precision analysis: split on dot and count digits"""
+    """Count digits before/after the decimal point of any JSON value"""
     if value is None:
         return 0, 0
     
-    # Convert to string and clean
-    str_val = str(value).strip()
+    # Lists and dicts can't be cache keys, and bools aren't numbers, so both
+    # take the plain text route
+    if isinstance(value, bool) or not isinstance(value, NUMERIC_TYPES):
+        return split_precision(str(value).strip())
+    
+    return number_precision(value)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def number_precision(value):
+    """Count digits before/after the decimal point from the Decimal digit tuple"""
+    try:
+        # repr() keeps the shortest round-tripping digits of a float
+        number = Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return split_precision(str(value).strip())
+    
+    if not number.is_finite():
+        return split_precision(str(value).strip())
+    if not number:
+        return 1, 0
     
-    # Split on decimal point
+    _, digits, exponent = number.as_tuple()
+    digits_before = max(1, len(digits) + exponent)
+    
+    # Trailing zeros after the decimal point don't count
+    digits_after = max(0, -exponent)
+    i = len(digits) - 1
+    while digits_after and digits[i] == 0:
+        digits_after -= 1
+        i -= 1
+    
+    return digits_before, digits_after
+
+
+def split_precision(str_val):
+    """Fallback for non-numeric text: split on dot and count characters"""
     if '.' in str_val:
         before_dot, after_dot = str_val.split('.', 1)
         # Remove trailing zeros from after decimal
@@ -27,85 +82,143 @@ def analyze_decimal_precision(value):
     return digits_before, digits_after
 
 
-def analyze_json_files(json_folder):
-    """Analyze specific numerical fields in JSON files"""
+def new_precision_stats():
+    """Empty max-precision tracker for every numerical field"""
+    return {field: {'before': 0, 'after': 0, 'max_left_example': '', 'max_right_example': ''} for field in ALL_FIELDS}
+
+
+def update_precision(stats, value):
+    """Fold one value into a field's max-precision tracker"""
+    before, after = analyze_decimal_precision(value)
     
-    # Define the fields we know are numerical
-    billionaire_fields = [
-        'finalWorth', 'estWorthPrev', 'archivedWorth', 'privateAssetsWorth'
-    ]
+    # Most values don't beat the current maximum, so only stringify when one does
+    if before > stats['before'] or after > stats['after']:
+        str_val = str(value)
+        
+        # Update max left digits and example
+        if before > stats['before']:
+            stats['before'] = before
+            stats['max_left_example'] = str_val
+        
+        # Update max right digits and example
+        if after > stats['after']:
+            stats['after'] = after
+            stats['max_right_example'] = str_val
+
+
+def _analyze_one(json_file):
+    """Max precision per field for a single JSON file (runs in a worker process)"""
+    precision_stats = new_precision_stats()
+    
+    # Pair each field with its tracker once instead of looking it up per value
+    billionaire_stats = [(field, precision_stats[field]) for field in BILLIONAIRE_FIELDS]
+    asset_stats = [(field, precision_stats[field]) for field in ASSET_FIELDS]
+    
+    try:
+        # Numbers arrive as Decimal, so the source digits are kept exactly
+        for record in iter_records(json_file):
+            # Analyze billionaire-level fields
+            for field, stats in billionaire_stats:
+                if field in record:
+                    update_precision(stats, record[field])
+            
+            # Analyze asset-level fields
+            for asset in record.get('financialAssets', []):
+                for field, stats in asset_stats:
+                    if field in asset:
+                        update_precision(stats, asset[field])
     
-    asset_fields = [
-        'numberOfShares', 'sharePrice', 'exchangeRate', 'exerciseOptionPrice', 'currentPrice'
-    ]
+    except Exception as e:
+        print(f"Error processing {json_file}: {e}")
+        # Drop whatever was read before the error rather than merge half a file
+        return new_precision_stats()
     
-    all_fields = billionaire_fields + asset_fields
+    return precision_stats
+
+
+def merge_precision_stats(total, part):
+    """Keep the per-field maximum of two precision trackers"""
+    for field, stats in part.items():
+        if stats['before'] > total[field]['before']:
+            total[field]['before'] = stats['before']
+            total[field]['max_left_example'] = stats['max_left_example']
+        
+        if stats['after'] > total[field]['after']:
+            total[field]['after'] = stats['after']
+            total[field]['max_right_example'] = stats['max_right_example']
+
+
+def analyze_json_files(json_folder):
+    """Analyze specific numerical fields in JSON files"""
     
     # Track max precision for each field
-    precision_stats = {field: {'before': 0, 'after': 0, 'max_left_example': '', 'max_right_example': ''} for field in all_fields}
+    precision_stats = new_precision_stats()
     
-    json_files = sorted(Path(json_folder).glob("*.json"))
+    # Sorted so the examples kept on ties are those of the oldest snapshot
+    json_files = sorted(iter_json_files(json_folder))
     if not json_files:
         print(f"No JSON files found in {json_folder}")
         return None
     
     print(f"Analyzing {len(json_files)} JSON files...")
     
-    for i, json_file in enumerate(json_files, 1):
-        if i % 10 == 0:
-            print(f"Processed {i}/{len(json_files)} files...")
-        
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Get records from different possible structures
-            records = (
-                data.get("personList", {}).get("personsLists") or
-                data.get("personList") or 
-                data.get("data", []) or
-                [data]  # Single record
-            )
+    progress_every = progress_interval(len(json_files), 10)
+    
+    # Files are independent, so analyze them in parallel and merge the maxima
+    # in file order
+    with Pool() as pool:
+        parts = pool.imap(_analyze_one, json_files, chunksize=64)
+        for i, part in enumerate(parts, 1):
+            if i % progress_every == 0:
+                print(f"Processed {i}/{len(json_files)} files...")
             
-            for record in records:
-                # Analyze billionaire-level fields
-                for field in billionaire_fields:
-                    if field in record:
-                        before, after = analyze_decimal_precision(record[field])
-                        
-                        # Update max left digits and example
-                        if before > precision_stats[field]['before']:
-                            precision_stats[field]['before'] = before
-                            precision_stats[field]['max_left_example'] = str(record[field])
-                        
-                        # Update max right digits and example
-                        if after > precision_stats[field]['after']:
-                            precision_stats[field]['after'] = after
-                            precision_stats[field]['max_right_example'] = str(record[field])
-                
-                # Analyze asset-level fields
-                for asset in record.get('financialAssets', []):
-                    for field in asset_fields:
-                        if field in asset:
-                            before, after = analyze_decimal_precision(asset[field])
-                            
-                            # Update max left digits and example
-                            if before > precision_stats[field]['before']:
-                                precision_stats[field]['before'] = before
-                                precision_stats[field]['max_left_example'] = str(asset[field])
-                            
-                            # Update max right digits and example
-                            if after > precision_stats[field]['after']:
-                                precision_stats[field]['after'] = after
-                                precision_stats[field]['max_right_example'] = str(asset[field])
-        
-        except Exception as e:
-            print(f"Error processing {json_file}: {e}")
-            continue
+            merge_precision_stats(precision_stats, part)
     
     return precision_stats
 
 
+def folder_fingerprint(json_folder):
+    """Folder path, file count and newest mtime, to tell when saved stats are stale"""
+    json_files = list(iter_json_files(json_folder))
+    return {
+        'json_folder': str(Path(json_folder).resolve()),
+        'file_count': len(json_files),
+        'max_mtime': max((os.stat(f).st_mtime for f in json_files), default=0.0),
+    }
+
+
+def save_stats(stats, stats_file, fingerprint):
+    """Persist per-field precision stats as a zstd-compressed Arrow IPC file"""
+    pl.DataFrame(
+        [{'field': field, **field_stats, **fingerprint} for field, field_stats in stats.items()],
+        schema={
+            'field': pl.Utf8,
+            'before': pl.Int32,
+            'after': pl.Int32,
+            'max_left_example': pl.Utf8,
+            'max_right_example': pl.Utf8,
+            'json_folder': pl.Utf8,
+            'file_count': pl.Int64,
+            'max_mtime': pl.Float64,
+        },
+    ).write_ipc(stats_file, compression='zstd')
+    print(f"Saved precision stats to {stats_file}")
+
+
+def load_stats(stats_file):
+    """Load stats written by save_stats, with the fingerprint of the folder they came from"""
+    stats = new_precision_stats()
+    fingerprint = None
+    for row in pl.read_ipc(stats_file).iter_rows(named=True):
+        # Files from before fingerprints were stored have no such columns
+        if 'json_folder' in row:
+            fingerprint = {key: row.pop(key) for key in ('json_folder', 'file_count', 'max_mtime')}
+        field = row.pop('field')
+        if field in stats:
+            stats[field].update(row)
+    return stats, fingerprint
+
+
 def print_results(stats):
     """Print analysis results"""
     print("\n" + "="*80)
@@ -192,13 +305,31 @@ def generate_schemas(stats):
 def main():
     parser = argparse.ArgumentParser(description="Analyze numerical precision in Forbes JSON files")
     parser.add_argument("json_folder", help="Folder containing JSON files")
+    parser.add_argument("--stats-file", help="Arrow file to reuse stats from, or save them to if missing or stale")
+    parser.add_argument("--refresh", action="store_true", help="Re-analyze even if --stats-file is up to date")
     args = parser.parse_args()
     
-    # Analyze files
-    stats = analyze_json_files(args.json_folder)
+    stats = None
+    if args.stats_file:
+        fingerprint = folder_fingerprint(args.json_folder)
+        if Path(args.stats_file).exists() and not args.refresh:
+            saved_stats, saved_fingerprint = load_stats(args.stats_file)
+            if saved_fingerprint == fingerprint:
+                # Skip re-parsing the JSON when stats were already computed
+                print(f"Loaded precision stats from {args.stats_file}; {args.json_folder} was not re-parsed")
+                stats = saved_stats
+            else:
+                print(f"{args.stats_file} doesn't match the files in {args.json_folder}, re-analyzing")
     
-    if not stats:
-        return False
+    if stats is None:
+        # Analyze files
+        stats = analyze_json_files(args.json_folder)
+        
+        if not stats:
+            return False
+        
+        if args.stats_file:
+            save_stats(stats, args.stats_file, fingerprint)
     
     # Print results
     print_results(stats)
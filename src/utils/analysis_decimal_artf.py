@@ -1,10 +1,53 @@
 #!/usr/bin/env python3
-import json
 import argparse
-from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, Counter
+from multiprocessing import Pool
 import re
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+
+from snapshot_files import iter_json_files, iter_records, progress_interval
+
+BILLIONAIRE_FIELDS = [
+    "finalWorth",
+    "estWorthPrev",
+    "archivedWorth",
+    "privateAssetsWorth",
+]
+
+ASSET_FIELDS = [
+    "numberOfShares",
+    "sharePrice",
+    "exchangeRate",
+    "exerciseOptionPrice",
+    "currentPrice",
+]
+
+# 5+ repeats of the same digit, e.g. 0.1000000000002 or 2.9999999
+REPEATING_DIGITS_RE = re.compile(r"(\d)\1{4,}")
+
+FLOAT_MARKERS = [
+    "00000000001",  # Very small trailing 1
+    "99999999999",  # Very long 9s
+    "000000001",  # Shorter trailing 1
+    "999999999",  # Shorter 9s
+    "0000001",  # Even shorter
+    "9999999",
+]
+
+# Common fractions that create long decimals
+COMMON_FRACTIONS = [
+    (num, den, Decimal(num) / Decimal(den))
+    for num, den in [
+        (1, 3),  # 0.333...
+        (2, 3),  # 0.666...
+        (1, 6),  # 0.1666...
+        (1, 7),  # 0.142857...
+        (1, 9),  # 0.111...
+        (1, 11),  # 0.090909...
+    ]
+]
+
+FRACTION_TOLERANCE = Decimal("0.000000001")
 
 
 def detect_float_artifacts(value):
@@ -24,213 +67,161 @@ def detect_float_artifacts(value):
             artifacts.append(f"long_decimal_{len(decimal_part)}")
 
     # 2. Repeating patterns that suggest binary->decimal conversion issues
-    if re.search(r"(\d)\1{4,}", str_val.replace(".", "")):
+    if REPEATING_DIGITS_RE.search(str_val.replace(".", "")):
         artifacts.append("repeating_digits")
 
-    # 3. Common floating-point precision markers
-    float_markers = [
-        "00000000001",  # Very small trailing 1
-        "99999999999",  # Very long 9s
-        "000000001",  # Shorter trailing 1
-        "999999999",  # Shorter 9s
-        "0000001",  # Even shorter
-        "9999999",
-    ]
-
-    for marker in float_markers:
-        if marker in str_val:
-            artifacts.append(f"float_marker_{marker[:6]}")
+        # 3. Common floating-point precision markers (each one contains a
+        # run of repeated digits, so only look for them after a match above)
+        for marker in FLOAT_MARKERS:
+            if marker in str_val:
+                artifacts.append(f"float_marker_{marker[:6]}")
 
     # 4. Scientific notation patterns when converted back
     try:
         float_val = float(str_val)
-        # If the float representation differs significantly from string
+        # Check if original string has way more precision than float can represent
         if abs(float_val) > 0:
-            # Check if original string has way more precision than float can represent
-            reconstructed = f"{float_val:.17g}"  # Max meaningful digits for float64
             if len(str_val.replace(".", "").replace("-", "")) > 17:
                 artifacts.append("excessive_precision")
     except ValueError:
         pass
 
     # 5. Check for values that are likely results of division/calculations
-    try:
-        decimal_val = Decimal(str_val)
-
-        # Common fractions that create long decimals
-        common_fractions = [
-            (1, 3),  # 0.333...
-            (2, 3),  # 0.666...
-            (1, 6),  # 0.1666...
-            (1, 7),  # 0.142857...
-            (1, 9),  # 0.111...
-            (1, 11),  # 0.090909...
-        ]
-
-        for num, den in common_fractions:
-            expected = Decimal(num) / Decimal(den)
-            # Check if value is close to these common fractions
-            if (
-                abs(decimal_val - expected) < Decimal("0.000000001")
-                and len(str_val) > 10
-            ):
-                artifacts.append(f"likely_fraction_{num}_{den}")
-
-    except:
-        pass
+    if len(str_val) > 10:
+        try:
+            decimal_val = Decimal(str_val)
+        except InvalidOperation:
+            decimal_val = None
+
+        if decimal_val is not None and decimal_val.is_finite():
+            for num, den, expected in COMMON_FRACTIONS:
+                # Check if value is close to these common fractions
+                if abs(decimal_val - expected) < FRACTION_TOLERANCE:
+                    artifacts.append(f"likely_fraction_{num}_{den}")
 
     return len(artifacts) > 0, artifacts
 
 
-def analyze_precision_artifacts(json_folder):
-    """Analyze JSON files for floating-point precision artifacts"""
+def new_field_stats():
+    """Empty artifact tracker for one field (module level so it pickles)"""
+    return {
+        "total_values": 0,
+        "artifact_values": 0,
+        "artifact_examples": [],
+        "clean_examples": [],
+        "max_clean_precision": {"before": 0, "after": 0, "value": ""},
+        "artifact_types": Counter(),
+    }
+
+
+def update_field_stats(field_stats, value):
+    """Fold one value into a field's artifact tracker"""
+    is_artifact, artifact_types = detect_float_artifacts(value)
+
+    field_stats["total_values"] += 1
+
+    if is_artifact:
+        field_stats["artifact_values"] += 1
+        if len(field_stats["artifact_examples"]) < 5:
+            field_stats["artifact_examples"].append(str(value))
+        field_stats["artifact_types"].update(artifact_types)
+    else:
+        str_val = str(value)
+
+        # Track clean values for precision analysis
+        if len(field_stats["clean_examples"]) < 5:
+            field_stats["clean_examples"].append(str_val)
+
+        # Update max clean precision
+        if "." in str_val:
+            before_dot, after_dot = str_val.split(".", 1)
+            before = len(before_dot.lstrip("-"))
+            after = len(after_dot.rstrip("0"))
+        else:
+            before = len(str_val.lstrip("-"))
+            after = 0
+
+        current_precision = before + after
+        max_precision = (
+            field_stats["max_clean_precision"]["before"]
+            + field_stats["max_clean_precision"]["after"]
+        )
+
+        if current_precision > max_precision:
+            field_stats["max_clean_precision"] = {
+                "before": before,
+                "after": after,
+                "value": str_val,
+            }
+
+
+def _analyze_one(json_file):
+    """Artifact stats for a single JSON file (runs in a worker process)"""
+    artifact_stats = defaultdict(new_field_stats)
+
+    # Pair each field with its tracker once instead of looking it up per value
+    billionaire_stats = [(field, artifact_stats[field]) for field in BILLIONAIRE_FIELDS]
+    asset_stats = [(field, artifact_stats[field]) for field in ASSET_FIELDS]
 
-    billionaire_fields = [
-        "finalWorth",
-        "estWorthPrev",
-        "archivedWorth",
-        "privateAssetsWorth",
-    ]
+    try:
+        # Numbers arrive as Decimal, so float artifacts in the source survive
+        for record in iter_records(json_file):
+            # Analyze billionaire fields
+            for field, field_stats in billionaire_stats:
+                if field in record:
+                    update_field_stats(field_stats, record[field])
+
+            # Analyze asset fields
+            for asset in record.get("financialAssets", []):
+                for field, field_stats in asset_stats:
+                    if field in asset:
+                        update_field_stats(field_stats, asset[field])
+
+    except Exception:
+        # Drop whatever was read before the error rather than merge half a file
+        return defaultdict(new_field_stats)
 
-    asset_fields = [
-        "numberOfShares",
-        "sharePrice",
-        "exchangeRate",
-        "exerciseOptionPrice",
-        "currentPrice",
-    ]
+    return artifact_stats
+
+
+def merge_field_stats(total, part):
+    """Merge one file's artifact tracker into the running totals"""
+    for field, stats in part.items():
+        field_total = total[field]
+        field_total["total_values"] += stats["total_values"]
+        field_total["artifact_values"] += stats["artifact_values"]
+        for key in ("artifact_examples", "clean_examples"):
+            missing = 5 - len(field_total[key])
+            field_total[key].extend(stats[key][:missing])
+        field_total["artifact_types"].update(stats["artifact_types"])
+
+        clean = stats["max_clean_precision"]
+        best = field_total["max_clean_precision"]
+        if clean["before"] + clean["after"] > best["before"] + best["after"]:
+            field_total["max_clean_precision"] = clean
+
+
+def analyze_precision_artifacts(json_folder):
+    """Analyze JSON files for floating-point precision artifacts"""
 
     # Track artifacts by field
-    artifact_stats = defaultdict(
-        lambda: {
-            "total_values": 0,
-            "artifact_values": 0,
-            "artifact_examples": [],
-            "clean_examples": [],
-            "max_clean_precision": {"before": 0, "after": 0, "value": ""},
-            "artifact_types": defaultdict(int),
-        }
-    )
+    artifact_stats = defaultdict(new_field_stats)
 
-    json_files = sorted(Path(json_folder).glob("*.json"))
+    # Sorted so the examples kept are those of the oldest snapshots
+    json_files = sorted(iter_json_files(json_folder))
     print(f"Analyzing {len(json_files)} JSON files for precision artifacts...")
 
-    for i, json_file in enumerate(json_files, 1):
-        if i % 50 == 0:
-            print(f"Processed {i}/{len(json_files)} files...")
+    progress_every = progress_interval(len(json_files), 50)
 
-        try:
-            with open(json_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            records = (
-                data.get("personList", {}).get("personsLists")
-                or data.get("personList")
-                or data.get("data", [])
-                or [data]
-            )
+    # Files are independent, so analyze them in parallel and merge the counts
+    # in file order
+    with Pool() as pool:
+        parts = pool.imap(_analyze_one, json_files, chunksize=64)
+        for i, part in enumerate(parts, 1):
+            if i % progress_every == 0:
+                print(f"Processed {i}/{len(json_files)} files...")
 
-            for record in records:
-                # Analyze billionaire fields
-                for field in billionaire_fields:
-                    if field in record:
-                        value = record[field]
-                        is_artifact, artifact_types = detect_float_artifacts(value)
-
-                        artifact_stats[field]["total_values"] += 1
-
-                        if is_artifact:
-                            artifact_stats[field]["artifact_values"] += 1
-                            if len(artifact_stats[field]["artifact_examples"]) < 5:
-                                artifact_stats[field]["artifact_examples"].append(
-                                    str(value)
-                                )
-                            for art_type in artifact_types:
-                                artifact_stats[field]["artifact_types"][art_type] += 1
-                        else:
-                            # Track clean values for precision analysis
-                            if len(artifact_stats[field]["clean_examples"]) < 5:
-                                artifact_stats[field]["clean_examples"].append(
-                                    str(value)
-                                )
-
-                            # Update max clean precision
-                            str_val = str(value)
-                            if "." in str_val:
-                                before_dot, after_dot = str_val.split(".", 1)
-                                before = len(before_dot.lstrip("-"))
-                                after = len(after_dot.rstrip("0"))
-                            else:
-                                before = len(str_val.lstrip("-"))
-                                after = 0
-
-                            current_precision = before + after
-                            max_precision = (
-                                artifact_stats[field]["max_clean_precision"]["before"]
-                                + artifact_stats[field]["max_clean_precision"]["after"]
-                            )
-
-                            if current_precision > max_precision:
-                                artifact_stats[field]["max_clean_precision"] = {
-                                    "before": before,
-                                    "after": after,
-                                    "value": str_val,
-                                }
-
-                # Analyze asset fields
-                for asset in record.get("financialAssets", []):
-                    for field in asset_fields:
-                        if field in asset:
-                            value = asset[field]
-                            is_artifact, artifact_types = detect_float_artifacts(value)
-
-                            artifact_stats[field]["total_values"] += 1
-
-                            if is_artifact:
-                                artifact_stats[field]["artifact_values"] += 1
-                                if len(artifact_stats[field]["artifact_examples"]) < 5:
-                                    artifact_stats[field]["artifact_examples"].append(
-                                        str(value)
-                                    )
-                                for art_type in artifact_types:
-                                    artifact_stats[field]["artifact_types"][
-                                        art_type
-                                    ] += 1
-                            else:
-                                if len(artifact_stats[field]["clean_examples"]) < 5:
-                                    artifact_stats[field]["clean_examples"].append(
-                                        str(value)
-                                    )
-
-                                # Update max clean precision
-                                str_val = str(value)
-                                if "." in str_val:
-                                    before_dot, after_dot = str_val.split(".", 1)
-                                    before = len(before_dot.lstrip("-"))
-                                    after = len(after_dot.rstrip("0"))
-                                else:
-                                    before = len(str_val.lstrip("-"))
-                                    after = 0
-
-                                current_precision = before + after
-                                max_precision = (
-                                    artifact_stats[field]["max_clean_precision"][
-                                        "before"
-                                    ]
-                                    + artifact_stats[field]["max_clean_precision"][
-                                        "after"
-                                    ]
-                                )
-
-                                if current_precision > max_precision:
-                                    artifact_stats[field]["max_clean_precision"] = {
-                                        "before": before,
-                                        "after": after,
-                                        "value": str_val,
-                                    }
-
-        except Exception as e:
-            continue
+            merge_field_stats(artifact_stats, part)
 
     return artifact_stats
 
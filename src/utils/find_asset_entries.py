@@ -1,87 +1,188 @@
 #!/usr/bin/env python3
+import io
 import json
+import os
 import sys
 from pathlib import Path
 import argparse
 from collections import defaultdict, Counter
-
-
-def analyze_json_files(json_folder):
-    """Analyze all JSON files to discover all possible asset columns"""
-    json_files = sorted(Path(json_folder).glob("*.json"))
-    if not json_files:
-        print(f"❌ No JSON files found in {json_folder}")
-        return False
-
-    # Track all discovered columns
-    all_asset_columns = set()
-    column_frequency = Counter()
-    column_sample_values = defaultdict(set)
-    column_data_types = defaultdict(set)
-
-    # Track structure variations
-    structure_variations = set()
-    total_files = len(json_files)
-    total_assets = 0
-    files_with_assets = 0
-
-    print(f"🔍 Analyzing {total_files} JSON files for asset columns...")
-    print("=" * 60)
-
-    for i, json_file in enumerate(json_files, 1):
-        if i % 50 == 0 or i == total_files:
-            print(f"📊 Progress: {i}/{total_files} files processed...")
-
-        try:
-            with open(json_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            # Try different possible data structures
-            records = (
-                data.get("personList", {}).get("personsLists")
-                or data.get("personList")
-                or data.get("data", [])
-            )
-
-            if not records:
-                continue
-
-            file_has_assets = False
-
-            for record in records:
-                financial_assets = record.get("financialAssets", [])
-
-                if financial_assets:
-                    file_has_assets = True
-
-                    for asset in financial_assets:
-                        if isinstance(asset, dict):
-                            total_assets += 1
-
-                            # Collect all keys from this asset
-                            asset_keys = set(asset.keys())
-                            all_asset_columns.update(asset_keys)
-                            structure_variations.add(tuple(sorted(asset_keys)))
-
-                            # Track frequency and sample values for each column
-                            for key, value in asset.items():
-                                column_frequency[key] += 1
-
-                                # Store sample values (limit to 5 per column)
-                                if len(column_sample_values[key]) < 5:
-                                    column_sample_values[key].add(
-                                        str(value)[:50]
-                                    )  # Truncate long values
-
-                                # Track data types
-                                column_data_types[key].add(type(value).__name__)
-
-            if file_has_assets:
-                files_with_assets += 1
-
-        except Exception as e:
-            print(f"⚠️  Error processing {json_file.name}: {e}")
-            continue
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from itertools import repeat
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from snapshot_files import iter_assets, iter_json_files, progress_interval
+
+# Names of the types JSON values decode to, saving a __name__ lookup per value
+TYPE_NAMES = {
+    int: "int",
+    float: "float",
+    str: "str",
+    bool: "bool",
+    type(None): "NoneType",
+    list: "list",
+    dict: "dict",
+}
+
+# Files handed to the workers per round of quick-mode counting; between rounds
+# the key sets found by full-analysis fallbacks join the known structures
+COUNT_BATCH_SIZE = 1024
+
+# Asset columns the conversion pipeline currently extracts
+CURRENT_COLUMNS = {
+    "numberOfShares",
+    "sharePrice",
+    "exchangeRate",
+    "ticker",
+    "companyName",
+    "currencyCode",
+    "exchange",
+    "interactive",
+}
+
+
+@dataclass(slots=True)
+class PartialStats:
+    """Column stats for one file, merged into the totals by merge_partial_stats"""
+
+    column_frequency: Counter = field(default_factory=Counter)
+    # At most a handful of entries each, where a list beats a set
+    column_sample_values: defaultdict = field(default_factory=lambda: defaultdict(list))
+    column_data_types: defaultdict = field(default_factory=lambda: defaultdict(list))
+    structure_variations: set = field(default_factory=set)
+    total_assets: int = 0
+    has_assets: bool = False
+    error: Exception = None
+
+
+def _analyze_one(json_file):
+    """Collect asset column stats for a single JSON file (runs in a worker process)"""
+    stats = PartialStats()
+    column_frequency = stats.column_frequency
+    column_sample_values = stats.column_sample_values
+    column_data_types = stats.column_data_types
+    # Assets share a handful of key sets, so sort each distinct one only once
+    seen_structures = set()
+    # Columns that already have their 5 samples
+    sampled = set()
+
+    # Local names for everything the per-value loop calls (LOAD_FAST, not globals)
+    count_columns = column_frequency.update
+    type_name_of = TYPE_NAMES.get
+    to_str, type_of, length = str, type, len
+
+    try:
+        # Entries that aren't objects have no columns, so drop them up front
+        assets = filter(lambda a: type(a) is dict, iter_assets(json_file))
+        for asset in assets:
+            stats.total_assets += 1
+
+            # Collect all keys from this asset
+            asset_keys = frozenset(asset)
+            if asset_keys not in seen_structures:
+                seen_structures.add(asset_keys)
+                stats.structure_variations.add(tuple(sorted(asset_keys)))
+
+            # Count every column of this asset in one C-level pass
+            count_columns(asset.keys())
+
+            # Track types and sample values for each column
+            for key, value in asset.items():
+                # Track data types (a new one can appear at any point)
+                data_types = column_data_types[key]
+                value_type = type_of(value)
+                type_name = type_name_of(value_type) or value_type.__name__
+                if type_name not in data_types:
+                    data_types.append(type_name)
+
+                # Once a column has its samples, skip formatting its values
+                if key in sampled:
+                    continue
+
+                # Keep the first 5 distinct samples, in file order
+                samples = column_sample_values[key]
+                sample = to_str(value)[:50]  # Truncate long values
+                if sample not in samples:
+                    samples.append(sample)
+                    if length(samples) == 5:
+                        sampled.add(key)
+
+        stats.has_assets = stats.total_assets > 0
+
+    except Exception as e:
+        # A file that fails partway contributes nothing, as if it never parsed
+        return PartialStats(error=e)
+
+    return stats
+
+
+def _count_one(json_file, known_structures):
+    """Count asset columns only, unless the file has a key set not seen before"""
+    stats = PartialStats()
+
+    try:
+        assets = filter(lambda a: type(a) is dict, iter_assets(json_file))
+        for asset in assets:
+            if frozenset(asset) not in known_structures:
+                # A new shape may bring new columns or types, so do the full pass
+                return _analyze_one(json_file)
+
+            stats.total_assets += 1
+            stats.column_frequency.update(asset.keys())
+
+        stats.has_assets = stats.total_assets > 0
+
+    except Exception as e:
+        # A file that fails partway contributes nothing, as if it never parsed
+        return PartialStats(error=e)
+
+    return stats
+
+
+def merge_partial_stats(totals, part):
+    """Fold one file's column stats into the running totals"""
+    totals["column_frequency"].update(part.column_frequency)
+    for key, samples in part.column_sample_values.items():
+        column_samples = totals["column_sample_values"][key]
+        for sample in samples:
+            # Store sample values (limit to 5 per column)
+            if len(column_samples) >= 5:
+                break
+            if sample not in column_samples:
+                column_samples.append(sample)
+    for key, data_types in part.column_data_types.items():
+        column_types = totals["column_data_types"][key]
+        column_types.extend(t for t in data_types if t not in column_types)
+    totals["structure_variations"] |= part.structure_variations
+    totals["total_assets"] += part.total_assets
+    totals["files_with_assets"] += part.has_assets
+
+
+def merge_file_stats(totals, part, json_file, i, total_files):
+    """Report progress and errors for the i-th file, then merge its stats"""
+    if i % progress_interval(total_files, 50) == 0 or i == total_files:
+        print(f"📊 Progress: {i}/{total_files} files processed...")
+
+    if part.error is not None:
+        print(f"⚠️  Error processing {os.path.basename(json_file)}: {part.error}")
+
+    merge_partial_stats(totals, part)
+
+
+def print_report(totals, total_files):
+    """Print the column summary, comparison and structure variations"""
+    column_frequency = totals["column_frequency"]
+    column_sample_values = totals["column_sample_values"]
+    column_data_types = totals["column_data_types"]
+    structure_variations = totals["structure_variations"]
+    total_assets = totals["total_assets"]
+    files_with_assets = totals["files_with_assets"]
+    all_asset_columns = set(column_frequency)
 
     print(f"\n📈 Analysis Summary:")
     print(f"   📁 Files processed: {total_files}")
@@ -94,7 +195,7 @@ def analyze_json_files(json_folder):
     print("=" * 60)
 
     # Sort columns by frequency (most common first)
-    sorted_columns = sorted(column_frequency.items(), key=lambda x: x[1], reverse=True)
+    sorted_columns = column_frequency.most_common()
 
     for i, (column, frequency) in enumerate(sorted_columns, 1):
         percentage = (frequency / total_assets * 100) if total_assets > 0 else 0
@@ -106,7 +207,7 @@ def analyze_json_files(json_folder):
 
         # Show sample values
         if column_sample_values[column]:
-            samples = list(column_sample_values[column])[:3]  # Show first 3 samples
+            samples = column_sample_values[column][:3]  # Show first 3 samples
             samples_str = ", ".join(f'"{s}"' for s in samples)
             if len(column_sample_values[column]) > 3:
                 samples_str += f" ... (+{len(column_sample_values[column])-3} more)"
@@ -117,19 +218,8 @@ def analyze_json_files(json_folder):
     print("🔍 Comparison with Current Extraction:")
     print("=" * 60)
 
-    current_columns = {
-        "numberOfShares",
-        "sharePrice",
-        "exchangeRate",
-        "ticker",
-        "companyName",
-        "currencyCode",
-        "exchange",
-        "interactive",
-    }
-
-    missing_in_current = all_asset_columns - current_columns
-    missing_in_discovered = current_columns - all_asset_columns
+    missing_in_current = all_asset_columns - CURRENT_COLUMNS
+    missing_in_discovered = CURRENT_COLUMNS - all_asset_columns
 
     if missing_in_current:
         print("❌ Columns found in JSON but NOT in current extraction:")
@@ -160,6 +250,106 @@ def analyze_json_files(json_folder):
             print(f"   {', '.join(structure)}")
             print()
 
+
+def write_report(totals, total_files, output_file):
+    """Save the column analysis as JSON for downstream tools"""
+    column_frequency = totals["column_frequency"]
+    total_assets = totals["total_assets"]
+    all_asset_columns = set(column_frequency)
+
+    report = {
+        "totals": {
+            "files_processed": total_files,
+            "files_with_assets": totals["files_with_assets"],
+            "total_assets": total_assets,
+            "unique_columns": len(all_asset_columns),
+            "structure_variations": len(totals["structure_variations"]),
+        },
+        "columns": [
+            {
+                "name": column,
+                "frequency": frequency,
+                "percentage": (
+                    frequency / total_assets * 100 if total_assets > 0 else 0
+                ),
+                "data_types": sorted(totals["column_data_types"][column]),
+                "samples": totals["column_sample_values"][column],
+            }
+            for column, frequency in column_frequency.most_common()
+        ],
+        "missing_in_current": sorted(all_asset_columns - CURRENT_COLUMNS),
+        "missing_in_discovered": sorted(CURRENT_COLUMNS - all_asset_columns),
+        "structures": [
+            list(structure)
+            for structure in sorted(
+                totals["structure_variations"], key=len, reverse=True
+            )
+        ],
+    }
+
+    if orjson is not None:
+        data = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(report, indent=2, ensure_ascii=False).encode("utf-8")
+    Path(output_file).write_bytes(data)
+
+
+def analyze_json_files(json_folder, quick=False, output_file=None):
+    """Analyze all JSON files to discover all possible asset columns"""
+    # Sorted so the kept samples and the --quick sample don't depend on the
+    # directory order
+    json_files = sorted(iter_json_files(json_folder))
+    if not json_files:
+        print(f"❌ No JSON files found in {json_folder}")
+        return False
+
+    # Track all discovered columns
+    totals = {
+        "column_frequency": Counter(),
+        "column_sample_values": defaultdict(list),
+        "column_data_types": defaultdict(list),
+        # Track structure variations
+        "structure_variations": set(),
+        "total_assets": 0,
+        "files_with_assets": 0,
+    }
+    total_files = len(json_files)
+
+    print(f"🔍 Analyzing {total_files} JSON files for asset columns...")
+    print("=" * 60)
+
+    # Quick mode fully analyzes ~1% of the files and only counts the rest
+    sample_size = max(10, total_files // 100) if quick else total_files
+
+    # Files are independent, so parse them in parallel and merge in sorted order
+    with ProcessPoolExecutor() as executor:
+        sample_files = json_files[:sample_size]
+        parts = executor.map(_analyze_one, sample_files, chunksize=16)
+        for i, (json_file, part) in enumerate(zip(sample_files, parts), 1):
+            merge_file_stats(totals, part, json_file, i, total_files)
+
+        if sample_size < total_files:
+            print(f"⚡ Counting the remaining files against {sample_size} samples...")
+            known_structures = {frozenset(s) for s in totals["structure_variations"]}
+            for start in range(sample_size, total_files, COUNT_BATCH_SIZE):
+                batch = json_files[start : start + COUNT_BATCH_SIZE]
+                parts = executor.map(
+                    _count_one, batch, repeat(frozenset(known_structures)), chunksize=16
+                )
+                for i, (json_file, part) in enumerate(zip(batch, parts), start + 1):
+                    merge_file_stats(totals, part, json_file, i, total_files)
+                    # Only fallback files report shapes; later batches count those directly
+                    known_structures.update(map(frozenset, part.structure_variations))
+
+    # Build the whole report in memory and write it out in one go
+    report = io.StringIO()
+    with redirect_stdout(report):
+        print_report(totals, total_files)
+    sys.stdout.write(report.getvalue())
+
+    if output_file:
+        write_report(totals, total_files, output_file)
+
     return True
 
 
@@ -168,7 +358,15 @@ def main():
         description="Discover all possible columns in Forbes financial assets data"
     )
     parser.add_argument("json_folder", help="Folder containing JSON files to analyze")
-    parser.add_argument("--output", help="Save column list to file (optional)")
+    parser.add_argument(
+        "--output", help="Save the column analysis as JSON to this file (optional)"
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Only count columns after the first ~1%% of files; samples and "
+        "types come from those files and any file with a new column set",
+    )
 
     args = parser.parse_args()
 
@@ -176,7 +374,9 @@ def main():
         print(f"❌ Folder not found: {args.json_folder}")
         return False
 
-    success = analyze_json_files(args.json_folder)
+    success = analyze_json_files(
+        args.json_folder, quick=args.quick, output_file=args.output
+    )
 
     if success and args.output:
         print(f"\n💾 Column analysis saved to: {args.output}")
@@ -0,0 +1,74 @@
+"""Helpers shared by the snapshot analysis scripts in this folder"""
+
+import os
+
+try:
+    import ijson.backends.yajl2_c as ijson
+except ImportError:
+    import ijson
+
+# Where the person records live, depending on the API version
+RECORD_PREFIXES = ["personList.personsLists.item", "personList.item", "data.item"]
+
+# Where the asset lists live, one per record prefix
+ASSET_PREFIXES = [f"{prefix}.financialAssets.item" for prefix in RECORD_PREFIXES]
+
+# Prefix that matched the last file, per prefix list; snapshots from one run
+# share a shape
+last_prefix = {}
+
+
+def iter_json_files(json_folder):
+    """Yield the paths of the JSON files in a folder as plain strings
+
+    Paths come in directory order; callers whose output depends on file order
+    sort them first.
+    """
+    with os.scandir(json_folder) as entries:
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                yield entry.path
+
+
+def iter_items(json_file, prefixes, **kwargs):
+    """Stream the items under the first prefix that has any, via ijson.items"""
+    key = tuple(prefixes)
+    last = last_prefix.get(key, prefixes[0])
+
+    # Every miss costs a full parse, so try the shape of the previous file first
+    ordered = [last] + [p for p in prefixes if p != last]
+
+    with open(json_file, "rb") as f:
+        for prefix in ordered:
+            f.seek(0)
+            found = False
+            for item in ijson.items(f, prefix, **kwargs):
+                found = True
+                yield item
+            if found:
+                last_prefix[key] = prefix
+                return
+
+
+def iter_records(json_file):
+    """Stream person records from a snapshot without loading the whole document"""
+    found = False
+    for record in iter_items(json_file, RECORD_PREFIXES):
+        found = True
+        yield record
+
+    if not found:
+        # Single record
+        with open(json_file, "rb") as f:
+            yield from ijson.items(f, "")
+
+
+def iter_assets(json_file):
+    """Stream financial asset entries from a snapshot, skipping everything else"""
+    # Plain floats keep the reported type names ("float", not "Decimal")
+    return iter_items(json_file, ASSET_PREFIXES, use_float=True)
+
+
+def progress_interval(total, minimum):
+    """Files per progress line, giving about 20 lines however many files there are"""
+    return max(minimum, total // 20)